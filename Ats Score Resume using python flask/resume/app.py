@@ -1,19 +1,41 @@
 from flask import Flask, render_template, request, redirect, url_for, flash, session, send_file
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, inspect, literal
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import load_only
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.security import check_password_hash
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
 from werkzeug.utils import secure_filename
 import os
+import hashlib
+import json
+import sqlite3
 import tempfile
-from datetime import datetime
+import calendar
+import threading
+from datetime import datetime, timedelta
 import uuid
 import re
+import zipfile
 from io import BytesIO
+from functools import lru_cache
+from collections import Counter
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
 
 # Document processing libraries
 import docx
-import PyPDF2
+import pypdfium2 as pdfium
 from docx import Document
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+from lxml import etree
+
+# Keyword matching
+import ahocorasick
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your_secret_key'
@@ -22,14 +44,82 @@ app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max upload
 
+# Applied to every new SQLite connection: WAL lets readers run alongside the
+# background writer and, with synchronous=NORMAL, avoids an fsync per commit
+SQLITE_PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA mmap_size=268435456',
+)
+
+# Resolved once so per-upload paths don't repeat the config lookup and normalization
+UPLOAD_DIR = os.path.abspath(app.config['UPLOAD_FOLDER'])
+
 # Create uploads folder if it doesn't exist
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 db = SQLAlchemy(app)
 login_manager = LoginManager(app)
 login_manager.login_view = 'login'
 
+@event.listens_for(Engine, 'connect')
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Tune SQLite connections; other database drivers are left alone"""
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    for pragma in SQLITE_PRAGMAS:
+        cursor.execute(pragma)
+    cursor.close()
+
 ALLOWED_EXTENSIONS = {'pdf', 'docx'}
+# Bump whenever PDF or DOCX text extraction changes so identical re-uploads
+# are parsed again instead of reusing text from an older extractor
+TEXT_EXTRACTOR_VERSION = 2
+ANALYSIS_WORKERS = 2  # Background threads parsing and scoring uploaded resumes
+MAX_QUEUED_ANALYSES = 8  # Uploads held in memory awaiting or under analysis
+PENDING_TIMEOUT = timedelta(minutes=10)  # Pending rows older than this lost their job, e.g. to a restart
+STATUS_POLL_LIMIT = 30  # Auto-refreshes of a pending resume page before giving up
+
+password_hasher = PasswordHasher(time_cost=2, memory_cost=64 * 1024, parallelism=2)
+
+# Parsing and scoring run off the request thread
+analysis_executor = ThreadPoolExecutor(max_workers=ANALYSIS_WORKERS)
+# Bounds the executor's queue, since every queued job holds a whole upload in memory
+analysis_slots = threading.BoundedSemaphore(MAX_QUEUED_ANALYSES)
+# PDFium is not thread-safe, so analysis threads take turns extracting PDFs
+pdfium_lock = threading.Lock()
+
+W_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+PDFIUM_TEXT_FIXES = str.maketrans({'\x02': None, '\ufffe': None})
+# Characters outside the XML 1.0 Char production
+INVALID_XML_CHAR_PATTERN = re.compile('[^\t\n\r\x20-\ud7ff\ue000-\ufffd\U00010000-\U0010ffff]')
+# Uploaded DOCX files are untrusted: never expand entities or fetch external resources
+DOCX_XML_PARSER = etree.XMLParser(resolve_entities=False, no_network=True)
+# str.translate table blanking every non-word character in the Basic Multilingual
+# Plane, indexed by code point (about 128KB); characters above it pass through
+NON_WORD_TABLE = ''.join(c if c.isalnum() or c == '_' else ' ' for c in map(chr, range(0x10000)))
+# Non-word characters beyond the table, e.g. emoji
+ASTRAL_NON_WORD_PATTERN = re.compile(r'[^\w\x00-\uffff]')
+PHRASE_MIN_COUNT = 2  # Two-word phrases repeated this often become keywords
+MIN_KEYWORD_LENGTH = 3
+MAX_SUGGESTED_KEYWORDS = 10
+# Bump whenever keyword extraction changes (stop words, phrases, ranking) so
+# stored JobDescription keywords are re-extracted
+KEYWORD_EXTRACTOR_VERSION = 2
+STOP_WORDS = frozenset({
+    'about', 'above', 'after', 'again', 'all', 'also', 'and', 'any', 'are', 'because',
+    'been', 'before', 'being', 'below', 'between', 'both', 'but', 'can', 'could', 'did',
+    'does', 'doing', 'down', 'during', 'each', 'etc', 'few', 'for', 'from', 'further',
+    'had', 'has', 'have', 'having', 'her', 'here', 'hers', 'him', 'his', 'how', 'into',
+    'its', 'just', 'may', 'more', 'most', 'must', 'not', 'now', 'off', 'once', 'only',
+    'other', 'our', 'ours', 'out', 'over', 'own', 'per', 'same', 'she', 'should', 'some',
+    'such', 'than', 'that', 'the', 'their', 'theirs', 'them', 'then', 'there', 'these',
+    'they', 'this', 'those', 'through', 'too', 'under', 'until', 'upon', 'very', 'via',
+    'was', 'were', 'what', 'when', 'where', 'which', 'while', 'who', 'whom', 'why',
+    'will', 'with', 'within', 'without', 'would', 'you', 'your', 'yours',
+})
 
 # Models
 class User(UserMixin, db.Model):
@@ -40,12 +130,28 @@ class User(UserMixin, db.Model):
     resumes = db.relationship('Resume', backref='user', lazy=True)
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
         
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        if not self.password_hash.startswith('$argon2'):
+            # Accounts created before the switch to Argon2 hold Werkzeug PBKDF2 hashes
+            return check_password_hash(self.password_hash, password)
+        try:
+            return password_hasher.verify(self.password_hash, password)
+        except (VerificationError, InvalidHashError):
+            return False
+    
+    def password_needs_rehash(self):
+        if not self.password_hash.startswith('$argon2'):
+            return True
+        return password_hasher.check_needs_rehash(self.password_hash)
     
 class Resume(db.Model):
+    __table_args__ = (
+        # Serves the per-user dashboard listing, newest first
+        db.Index('ix_resume_user_created', 'user_id', 'created_at'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     filename = db.Column(db.String(200), nullable=False)
     original_text = db.Column(db.Text, nullable=True)
@@ -53,8 +159,20 @@ class Resume(db.Model):
     job_description = db.Column(db.Text, nullable=True)
     ats_score = db.Column(db.Float, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     file_type = db.Column(db.String(10), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='complete')  # pending, complete or failed
+    content_hash = db.Column(db.String(64), nullable=True, index=True)  # BLAKE2b of the uploaded file
+    text_extractor_version = db.Column(db.Integer, nullable=True)  # TEXT_EXTRACTOR_VERSION of original_text
+    job_description_hash = db.Column(db.String(64), db.ForeignKey('job_description.hash'), nullable=True)
+    
+class JobDescription(db.Model):
+    """Keywords extracted from a job description, shared by every resume scored against it"""
+    hash = db.Column(db.String(64), primary_key=True)  # BLAKE2b of the normalized text
+    keywords = db.Column(db.Text, nullable=False)  # JSON list
+    extractor_version = db.Column(db.Integer, nullable=True)  # KEYWORD_EXTRACTOR_VERSION used
+    resumes = db.relationship('Resume', backref='job', lazy=True)
     
 @login_manager.user_loader
 def load_user(user_id):
@@ -65,46 +183,152 @@ def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 def extract_text_from_pdf(pdf_file):
-    pdf_reader = PyPDF2.PdfReader(pdf_file)
-    text = ""
-    for page in pdf_reader.pages:
-        text += page.extract_text() if page.extract_text() else ""
-    return text
+    """Extract text from a PDF given a path, bytes or a binary file object"""
+    with pdfium_lock:
+        pdf = pdfium.PdfDocument(pdf_file)
+        try:
+            text = "\n".join(page.get_textpage().get_text_bounded() for page in pdf)
+        finally:
+            pdf.close()
+    
+    # PDFium ends lines with \r\n and marks words hyphenated across a line break
+    # with \x02 (or \ufffe); dropping the marker rejoins the word
+    return text.replace("\r\n", "\n").translate(PDFIUM_TEXT_FIXES)
 
 def extract_text_from_docx(docx_file):
-    doc = Document(docx_file)
-    text = ""
-    for para in doc.paragraphs:
-        text += para.text + "\n"
-    return text
-
-def parse_resume(file_path, file_type):
-    """Extract text from resume file"""
+    """Extract body paragraph text straight from word/document.xml"""
+    with zipfile.ZipFile(docx_file) as archive:
+        with archive.open('word/document.xml') as document_xml:
+            body = etree.parse(document_xml, DOCX_XML_PARSER).getroot().find(W_NS + 'body')
+
+    lines = []
+    for paragraph in body.iterchildren(W_NS + 'p'):
+        parts = []
+        for child in paragraph.iterchildren(W_NS + 'r'):
+            for node in child:
+                if node.tag == W_NS + 't':
+                    parts.append(node.text or "")
+                elif node.tag == W_NS + 'tab':
+                    parts.append("\t")
+                elif node.tag in (W_NS + 'br', W_NS + 'cr'):
+                    parts.append("\n")
+        lines.append("".join(parts) + "\n")
+    return "".join(lines)
+
+def save_upload(file_data, file_path):
+    """Archive an uploaded file with a single write and return its content hash"""
+    with open(file_path, 'wb') as out:
+        out.write(file_data)
+    return hashlib.blake2b(file_data, digest_size=32).hexdigest()
+
+def parse_resume(resume_file, file_type):
+    """Extract text from a resume given a path, bytes or a binary file object"""
     if file_type == 'pdf':
-        with open(file_path, 'rb') as file:
-            return extract_text_from_pdf(file)
+        return extract_text_from_pdf(resume_file)
     elif file_type == 'docx':
-        return extract_text_from_docx(file_path)
+        if isinstance(resume_file, bytes):
+            # BytesIO shares the bytes buffer rather than copying it
+            resume_file = BytesIO(resume_file)
+        return extract_text_from_docx(resume_file)
     return ""
 
+def tokenize(text):
+    """Casefold a document and return its words in order"""
+    text = text.casefold()
+    if text and max(text) > '\uffff':
+        text = ASTRAL_NON_WORD_PATTERN.sub(' ', text)
+    return text.translate(NON_WORD_TABLE).split()
+
+def is_keyword(word):
+    """Filter out stop words, very short words and bare numbers"""
+    return len(word) >= MIN_KEYWORD_LENGTH and word not in STOP_WORDS and not word.isdigit()
+
+def extract_jd_keywords(job_description):
+    """Collect job description words plus its recurring two-word phrases, most frequent first"""
+    words = tokenize(job_description)
+    keyword_counts = Counter(word for word in words if is_keyword(word))
+    phrase_counts = Counter()
+    for (first, second), count in Counter(zip(words, words[1:])).items():
+        if count >= PHRASE_MIN_COUNT and first in keyword_counts and second in keyword_counts:
+            phrase_counts[f"{first} {second}"] = count
+    
+    # Words used only inside a kept phrase are covered by it; keep their standalone uses
+    for phrase, count in phrase_counts.items():
+        keyword_counts.subtract(dict.fromkeys(phrase.split(), count))
+    keyword_counts = +keyword_counts
+    keyword_counts.update(phrase_counts)
+    return [keyword for keyword, _ in keyword_counts.most_common()]
+
+def hash_job_description(job_description):
+    """Hash a job description, ignoring case and whitespace differences"""
+    normalized = " ".join(job_description.casefold().split())
+    return hashlib.blake2b(normalized.encode(), digest_size=32).hexdigest()
+
+def get_job_description(job_description):
+    """Stored keywords for a job description, extracting and saving them on first use.
+    
+    Commits the session when keywords are (re-)extracted.
+    """
+    jd_hash = hash_job_description(job_description)
+    job = JobDescription.query.get(jd_hash)
+    if job is not None and job.extractor_version == KEYWORD_EXTRACTOR_VERSION:
+        return job
+    
+    keywords = json.dumps(extract_jd_keywords(job_description))
+    if job is None:
+        job = JobDescription(hash=jd_hash)
+        db.session.add(job)
+    job.keywords = keywords
+    job.extractor_version = KEYWORD_EXTRACTOR_VERSION
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Another upload stored the same posting first; use its row
+        db.session.rollback()
+        job = JobDescription.query.get(jd_hash)
+    return job
+
+@lru_cache(maxsize=512)
+def build_keyword_matcher(job_keywords):
+    """Build an Aho-Corasick automaton over the job description keywords"""
+    if not job_keywords:
+        return None
+    
+    automaton = ahocorasick.Automaton()
+    for keyword in job_keywords:
+        # Pad with spaces so keywords only match whole words
+        automaton.add_word(f" {keyword} ", keyword)
+    automaton.make_automaton()
+    return automaton
+
 def compare_with_job_description(resume_text, job_description):
     """Compare resume with job description to find missing keywords"""
-    resume_words = set(re.findall(r'\b\w+\b', resume_text.lower()))
-    job_words = set(re.findall(r'\b\w+\b', job_description.lower()))
+    job = get_job_description(job_description)
+    ranked_keywords = json.loads(job.keywords)
+    job_keywords = frozenset(ranked_keywords)
+    matcher = build_keyword_matcher(job_keywords)
     
-    # Simple keyword matching (would be more sophisticated in production)
-    important_words = job_words - resume_words
+    # Scan the normalized resume once for every keyword and phrase
+    if matcher is not None:
+        resume_words = f" {' '.join(tokenize(resume_text))} "
+        match_words = {keyword for _, keyword in matcher.iter(resume_words)}
+    else:
+        match_words = set()
+    
+    # Only the most frequent missing keywords are suggested, so stop once there are enough
+    missing_keywords = (keyword for keyword in ranked_keywords if keyword not in match_words)
+    important_words = list(islice(missing_keywords, MAX_SUGGESTED_KEYWORDS))
     
     # Calculate basic ATS score (percentage of job keywords found in resume)
-    if len(job_words) > 0:
-        match_words = job_words.intersection(resume_words)
-        score = (len(match_words) / len(job_words)) * 100
+    if job_keywords:
+        score = 100 * len(match_words) / len(job_keywords)
     else:
         score = 0
         
     return {
         'score': score,
-        'missing_keywords': list(important_words)
+        'missing_keywords': important_words,
+        'job_description_hash': job.hash
     }
 
 def optimize_resume(resume_text, job_description, analysis):
@@ -112,28 +336,53 @@ def optimize_resume(resume_text, job_description, analysis):
     # In a real system, this would be more sophisticated
     # For demo purposes, we'll just add a section with missing keywords
     
-    optimized = resume_text
+    # Collect the pieces and join once rather than growing a copy of the resume
+    parts = [resume_text]
     
     if analysis['missing_keywords']:
-        missing_keywords = ", ".join(analysis['missing_keywords'][:10])  # First 10 keywords
-        suggestion = f"\n\n--- OPTIMIZATION SUGGESTIONS ---\n"
-        suggestion += f"Consider adding these keywords: {missing_keywords}\n"
-        suggestion += f"Your resume matches {analysis['score']:.1f}% of job requirements.\n"
-        
-        optimized += suggestion
+        missing_keywords = ", ".join(analysis['missing_keywords'])  # Most frequent first
+        parts.append("\n\n--- OPTIMIZATION SUGGESTIONS ---\n")
+        parts.append(f"Consider adding these keywords: {missing_keywords}\n")
+        parts.append(f"Your resume matches {analysis['score']:.1f}% of job requirements.\n")
         
-    return optimized
+    return "".join(parts)
 
-def create_optimized_docx(original_text, optimized_text):
-    """Create a new DOCX with the optimized content"""
+def build_docx_template():
+    """Serialize the blank, headed document every optimized DOCX starts from"""
     doc = Document()
     doc.add_heading('Optimized Resume', 0)
+    buffer = BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+DOCX_TEMPLATE = build_docx_template()
+
+def create_optimized_docx(original_text, optimized_text):
+    """Create a new DOCX with the optimized content"""
+    doc = Document(BytesIO(DOCX_TEMPLATE))
     
-    # Add the optimized text
-    paragraphs = optimized_text.split('\n')
-    for para in paragraphs:
-        if para.strip():
-            doc.add_paragraph(para)
+    # Add the optimized text as raw <w:p> elements, skipping python-docx
+    # Paragraph proxies; body content must stay ahead of the section properties
+    section_properties = doc.element.body.sectPr
+    for para in optimized_text.splitlines():
+        # lxml rejects characters XML can't represent, e.g. stray control characters
+        para = INVALID_XML_CHAR_PATTERN.sub('', para)
+        if not para.strip():
+            continue
+        p = OxmlElement('w:p')
+        r = OxmlElement('w:r')
+        # Tabs become <w:tab/> between text runs, as python-docx's run.text does
+        for i, segment in enumerate(para.split('\t')):
+            if i:
+                r.append(OxmlElement('w:tab'))
+            if segment:
+                t = OxmlElement('w:t')
+                if segment != segment.strip():
+                    t.set(qn('xml:space'), 'preserve')
+                t.text = segment
+                r.append(t)
+        p.append(r)
+        section_properties.addprevious(p)
     
     # Save to a BytesIO object
     buffer = BytesIO()
@@ -141,6 +390,99 @@ def create_optimized_docx(original_text, optimized_text):
     buffer.seek(0)
     return buffer
 
+def optimized_docx_path(resume):
+    """Location of the persisted optimized DOCX for a resume"""
+    return os.path.join(UPLOAD_DIR, f"optimized_{resume.id}.docx")
+
+def write_optimized_docx(resume):
+    """Generate the optimized DOCX for a resume and persist it next to the uploads"""
+    file_path = optimized_docx_path(resume)
+    buffer = create_optimized_docx(resume.original_text, resume.optimized_text)
+    
+    # Write to a temporary file first so concurrent downloads never see a partial file
+    temp_path = f"{file_path}.{uuid.uuid4().hex}.tmp"
+    with open(temp_path, 'wb') as out:
+        out.write(buffer.getbuffer())
+    os.replace(temp_path, file_path)
+    return file_path
+
+def get_optimized_docx(resume):
+    """Path to an up-to-date optimized DOCX, regenerating it if missing or stale"""
+    file_path = optimized_docx_path(resume)
+    updated_at = resume.updated_at or resume.created_at
+    try:
+        is_stale = os.path.getmtime(file_path) < calendar.timegm(updated_at.utctimetuple())
+    except OSError:
+        is_stale = True
+    
+    if is_stale:
+        write_optimized_docx(resume)
+    return file_path
+
+def find_parsed_text(content_hash, file_type):
+    """Text already extracted from an identical upload, if there is one"""
+    parsed = (
+        Resume.query
+        .options(load_only(Resume.original_text))
+        .filter_by(
+            content_hash=content_hash,
+            file_type=file_type,
+            status='complete',
+            text_extractor_version=TEXT_EXTRACTOR_VERSION
+        )
+        .filter(Resume.original_text.isnot(None))
+        .first()
+    )
+    return parsed.original_text if parsed else None
+
+def process_resume(resume_id, file_data):
+    """Parse, score and optimize an uploaded resume in the background"""
+    with app.app_context():
+        resume = Resume.query.get(resume_id)
+        try:
+            # Parse resume, unless the same file was already parsed
+            resume_text = find_parsed_text(resume.content_hash, resume.file_type)
+            if resume_text is None:
+                resume_text = parse_resume(file_data, resume.file_type)
+            
+            # Only analyze if job description is provided
+            if resume.job_description:
+                analysis = compare_with_job_description(resume_text, resume.job_description)
+                optimized_text = optimize_resume(resume_text, resume.job_description, analysis)
+                ats_score = analysis['score']
+                resume.job_description_hash = analysis['job_description_hash']
+            else:
+                optimized_text = resume_text
+                ats_score = 0
+            
+            resume.original_text = resume_text
+            resume.text_extractor_version = TEXT_EXTRACTOR_VERSION
+            resume.optimized_text = optimized_text
+            resume.ats_score = ats_score
+            resume.status = 'complete'
+            db.session.commit()
+        except Exception:
+            app.logger.exception('Failed to process resume %s', resume_id)
+            db.session.rollback()
+            resume.status = 'failed'
+            db.session.commit()
+            return
+        
+        # Persist the optimized DOCX now so downloads are served straight from disk;
+        # if this fails, get_optimized_docx regenerates it on the first download
+        try:
+            write_optimized_docx(resume)
+        except Exception:
+            app.logger.exception('Failed to write optimized DOCX for resume %s', resume_id)
+
+def fail_stale_resumes():
+    """Mark resumes whose background job was lost, e.g. to a restart, as failed"""
+    cutoff = datetime.utcnow() - PENDING_TIMEOUT
+    Resume.query.filter(Resume.status == 'pending', Resume.created_at < cutoff).update(
+        {'status': 'failed', 'updated_at': datetime.utcnow()}, synchronize_session=False
+    )
+    db.session.commit()
+
 # Routes
 @app.route('/')
 def index():
@@ -189,6 +531,10 @@ def login():
         user = User.query.filter_by(username=username).first()
         
         if user and user.check_password(password):
+            # Upgrade legacy or outdated hashes while the plaintext is at hand
+            if user.password_needs_rehash():
+                user.set_password(password)
+                db.session.commit()
             login_user(user)
             next_page = request.args.get('next')
             return redirect(next_page or url_for('dashboard'))
@@ -206,7 +552,14 @@ def logout():
 @app.route('/dashboard')
 @login_required
 def dashboard():
-    user_resumes = Resume.query.filter_by(user_id=current_user.id).all()
+    # The listing only needs summary columns, so skip loading the resume texts
+    user_resumes = (
+        Resume.query
+        .options(load_only(Resume.id, Resume.filename, Resume.ats_score, Resume.created_at, Resume.file_type, Resume.status))
+        .filter_by(user_id=current_user.id)
+        .order_by(Resume.created_at.desc())
+        .all()
+    )
     return render_template('dashboard.html', resumes=user_resumes)
 
 @app.route('/upload', methods=['GET', 'POST'])
@@ -226,40 +579,42 @@ def upload_resume():
             return redirect(request.url)
         
         if file and allowed_file(file.filename):
-            # Save file with secure filename
-            filename = secure_filename(file.filename)
-            file_extension = filename.rsplit('.', 1)[1].lower()
-            unique_filename = f"{uuid.uuid4().hex}.{file_extension}"
-            file_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-            file.save(file_path)
-            
-            # Parse resume
-            resume_text = parse_resume(file_path, file_extension)
-            
-            # Only analyze if job description is provided
-            if job_description:
-                analysis = compare_with_job_description(resume_text, job_description)
-                optimized_text = optimize_resume(resume_text, job_description, analysis)
-                ats_score = analysis['score']
-            else:
-                optimized_text = resume_text
-                ats_score = 0
+            # Refuse new work rather than queue unbounded uploads in memory
+            if not analysis_slots.acquire(blocking=False):
+                flash('The server is busy analyzing other resumes. Please try again shortly.', 'warning')
+                return redirect(request.url)
             
-            # Save to database
-            new_resume = Resume(
-                filename=filename,
-                original_text=resume_text,
-                optimized_text=optimized_text,
-                job_description=job_description,
-                ats_score=ats_score,
-                user_id=current_user.id,
-                file_type=file_extension
-            )
+            try:
+                # Read the upload once; the same bytes are archived and parsed
+                file_data = file.stream.read()
+                
+                # Save file with secure filename
+                filename = secure_filename(file.filename)
+                file_extension = filename.rsplit('.', 1)[1].lower()
+                unique_filename = f"{uuid.uuid4().hex}.{file_extension}"
+                file_path = os.path.join(UPLOAD_DIR, unique_filename)
+                content_hash = save_upload(file_data, file_path)
+                
+                # Save to database; parsing and analysis fill in the rest
+                new_resume = Resume(
+                    filename=filename,
+                    job_description=job_description,
+                    user_id=current_user.id,
+                    file_type=file_extension,
+                    status='pending',
+                    content_hash=content_hash
+                )
+                
+                db.session.add(new_resume)
+                db.session.commit()
+                
+                future = analysis_executor.submit(process_resume, new_resume.id, file_data)
+            except BaseException:
+                analysis_slots.release()
+                raise
+            future.add_done_callback(lambda _: analysis_slots.release())
             
-            db.session.add(new_resume)
-            db.session.commit()
-            
-            flash('Resume uploaded and analyzed successfully!', 'success')
+            flash('Resume uploaded! Analysis is in progress.', 'success')
             return redirect(url_for('view_resume', resume_id=new_resume.id))
         else:
             flash('Only PDF and DOCX files are allowed', 'danger')
@@ -276,7 +631,18 @@ def view_resume(resume_id):
         flash('Access denied', 'danger')
         return redirect(url_for('dashboard'))
     
-    return render_template('view_resume.html', resume=resume)
+    # A job lost to a restart would otherwise leave the page pending forever
+    if resume.status == 'pending' and resume.created_at < datetime.utcnow() - PENDING_TIMEOUT:
+        resume.status = 'failed'
+        db.session.commit()
+    
+    poll_count = request.args.get('poll', 0, type=int)
+    return render_template(
+        'view_resume.html',
+        resume=resume,
+        poll_count=poll_count,
+        poll_limit=STATUS_POLL_LIMIT
+    )
 
 @app.route('/download/<int:resume_id>')
 @login_required
@@ -288,20 +654,60 @@ def download_resume(resume_id):
         flash('Access denied', 'danger')
         return redirect(url_for('dashboard'))
     
-    # Create optimized docx file
-    buffer = create_optimized_docx(resume.original_text, resume.optimized_text)
+    if resume.status != 'complete':
+        flash('This resume has not finished processing yet.', 'warning')
+        return redirect(url_for('view_resume', resume_id=resume.id))
+    
+    # Serve the persisted optimized docx file
+    file_path = get_optimized_docx(resume)
     
     # Return the file
     return send_file(
-        buffer,
+        file_path,
         as_attachment=True,
         download_name=f"optimized_{resume.filename.rsplit('.', 1)[0]}.docx",
-        mimetype='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+        mimetype='application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+        conditional=True,
+        etag=True,
+        last_modified=resume.updated_at or resume.created_at
     )
 
+def upgrade_schema():
+    """Add columns and indexes that create_all() skips on tables that already exist"""
+    preparer = db.engine.dialect.identifier_preparer
+    with db.engine.begin() as connection:
+        inspector = inspect(connection)
+        for table in db.metadata.sorted_tables:
+            existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                
+                ddl = (
+                    f"ALTER TABLE {preparer.format_table(table)} "
+                    f"ADD COLUMN {preparer.format_column(column)} {column.type.compile(dialect=connection.dialect)}"
+                )
+                if column.default is not None and column.default.is_scalar:
+                    default = literal(column.default.arg).compile(
+                        dialect=connection.dialect, compile_kwargs={'literal_binds': True}
+                    )
+                    ddl += f" NOT NULL DEFAULT {default}"
+                for foreign_key in column.foreign_keys:
+                    ddl += (
+                        f" REFERENCES {preparer.format_table(foreign_key.column.table)}"
+                        f" ({preparer.format_column(foreign_key.column)})"
+                    )
+                app.logger.info('Adding missing column %s.%s', table.name, column.name)
+                connection.exec_driver_sql(ddl)
+            
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
+
 # Initialize database
 with app.app_context():
     db.create_all()
+    upgrade_schema()
+    fail_stale_resumes()
 
 if __name__ == "__main__":
     app.run(debug=True)